@@ -0,0 +1,85 @@
+import httpx
+import json
+import os
+
+# File keeping the ETags and bodies of listing responses between runs
+path = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'mirrormaker', 'etags.json')
+
+# Response headers needed to handle pagination of a cached response
+CACHED_HEADERS = ['Link', 'X-Next-Page', 'X-Total-Pages']
+
+# Cached responses by URL, loaded on first use
+entries = None
+
+
+def load():
+    """Loads the cached responses, starting from an empty cache if the file is missing or unreadable.
+
+    Returns:
+     - Dictionary of cached responses by URL.
+    """
+
+    global entries
+
+    if entries is None:
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+
+    return entries
+
+
+def save():
+    """Writes the cached responses back to disk. The cache is best effort, failures are ignored.
+
+    The file is only readable by the user since it holds bodies of authenticated responses.
+    """
+
+    if entries is None:
+        return
+
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            os.fchmod(f.fileno(), 0o600)
+            json.dump(entries, f)
+    except OSError:
+        pass
+
+
+async def cached_get(client, url, params = {}):
+    """Sends a conditional GET request, reusing the cached body when the resource has not changed.
+
+    A 304 response doesn't count against the GitHub rate limit and carries no body.
+
+    Args:
+     - client: HTTP client to send the request with.
+     - url: URL of the resource.
+     - params: Query parameters of the request.
+
+    Returns:
+     - Response of the request, a 304 being replaced by the cached response.
+    """
+
+    key = str(httpx.URL(url, params=params))
+    entry = load().get(key)
+
+    headers = {'If-None-Match': entry['etag']} if entry else {}
+    r = await client.get(url, params=params, headers=headers)
+
+    if r.status_code == 304 and entry:
+        # The ETag only reflects the body, pagination headers may have changed (eg: a page was added)
+        entry['headers'].update({name: r.headers[name] for name in CACHED_HEADERS if name in r.headers})
+        return httpx.Response(200, headers=entry['headers'], content=entry['content'].encode(), request=r.request)
+
+    if r.is_success and 'ETag' in r.headers:
+        entries[key] = {
+            'etag': r.headers['ETag'],
+            'headers': {name: r.headers[name] for name in CACHED_HEADERS if name in r.headers},
+            'content': r.text
+        }
+
+    return r
+
@@ -1,8 +1,12 @@
-import requests
-import sys
+import httpx
+import logging
+import orjson
 
-from pprint import pprint
 from itertools import zip_longest
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+from . import cache
+from . import session
 
 # GitHub user authentication token
 token = ''
@@ -10,49 +14,143 @@ token = ''
 # GitHub username (under this user namespace the mirrors will be created)
 user = ''
 
+logger = logging.getLogger(__name__)
 
-def get_repos(github_org):
+# API locations of the run, set once by configure()
+cfg = SimpleNamespace(repos_url='https://api.github.com/user/repos', owner=user)
+
+# HTTP client shared by all API calls
+_session = session.Session()
+
+
+def _client():
+    """Returns the HTTP client shared by all GitHub API calls."""
+
+    return _session.client(token)
+
+
+async def close():
+    """Closes the shared HTTP client."""
+
+    await _session.close()
+
+
+def configure(github_org, github_user):
+    """Sets the API locations used by the GitHub calls of this run.
+
+    Args:
+     - github_org: GitHub organisation, the user namespace is used if not set.
+     - github_user: GitHub username.
+    """
+
+    global cfg
+
+    cfg = SimpleNamespace(
+        repos_url=f'https://api.github.com/orgs/{github_org}/repos' if github_org else 'https://api.github.com/user/repos',
+        owner=github_org if github_org else github_user
+    )
+
+
+def _error_body(e):
+    """Parses the JSON body of a failed request, empty if there is none or it isn't an object."""
+
+    response = getattr(e, 'response', None)
+    try:
+        body = orjson.loads(response.content) if response is not None else {}
+    except orjson.JSONDecodeError:
+        return {}
+
+    return body if isinstance(body, dict) else {}
+
+
+async def get_repos():
     """Finds all public GitHub repositories (which are not forks) of authenticated user.
 
     Returns:
      - List of public GitHub repositories.
     """
 
-    github_path = f'orgs/{github_org}' if github_org else f'user' 
-    url = f'https://api.github.com/{github_path}/repos'
-    headers = {'Authorization': f'Bearer {token}'}
+    url = cfg.repos_url
 
     repos = []
     try:
-        while url:
-            r = requests.get(url, headers=headers)
-            r.raise_for_status()
-            repos.extend(r.json())
-            # handle pagination
-            url = r.links.get("next", {}).get("url", None)
-
-    except requests.exceptions.RequestException as e:
+        client = _client()
+        r = await cache.cached_get(client, url)
+        r.raise_for_status()
+        repos.extend(orjson.loads(r.content))
+
+        # handle pagination: the last page is known up front, fetch the rest at once
+        last_url = r.links.get("last", {}).get("url", None)
+        if last_url:
+            last_page = int(parse_qs(urlparse(last_url).query)["page"][0])
+            for page in await session.get_pages(client, url, range(2, last_page + 1)):
+                repos.extend(page)
+
+    except httpx.HTTPError as e:
         raise SystemExit(e)
 
     # Return only non forked repositories
     return [x for x in repos if not x['fork']]
 
 
-def repo_exists(github_repos, repo_slug):
+def repo_exists(github_repos_by_name, repo_slug):
     """Checks if a repository with a given slug exists among the public GitHub repositories.
 
     Args:
-     - github_repos: List of GitHub repositories.
-     - repo_slug: Repository slug (usually in a form of path with a namespace, eg: "username/reponame").
+     - github_repos_by_name: GitHub repositories by casefolded full name (eg: "username/reponame").
+     - repo_slug: Casefolded repository slug (usually in a form of path with a namespace, eg: "username/reponame").
 
     Returns:
      - True if repository exists, False otherwise.
     """
-    
-    return any(repo['full_name'].endswith("/"+repo_slug) for repo in github_repos)
 
+    return repo_slug in github_repos_by_name
+
+
+def repo_metadata(gitlab_repo):
+    """Builds the GitHub repository metadata (ie. description, visibility etc.) matching given GitLab repository.
+
+    Args:
+     - gitlab_repo: GitLab repository.
+
+    Returns:
+     - Metadata fields, as sent to the GitHub API.
+    """
 
-def create_repo(gitlab_repo, github_org):
+    return {
+        'description': f'{gitlab_repo["description"]}',
+        'homepage': gitlab_repo['web_url'],
+        'private': False if gitlab_repo["visibility"] == "public" else True,
+        'has_wiki': False,
+        'has_projects': False
+    }
+
+
+def repo_outdated(github_repo, gitlab_repo):
+    """Checks if the metadata of a GitHub repository differs from the one of its GitLab repository.
+
+    Args:
+     - github_repo: GitHub repository, as listed by get_repos().
+     - gitlab_repo: GitLab repository.
+
+    Returns:
+     - True if the GitHub repository needs to be patched, False otherwise.
+    """
+
+    for field, value in repo_metadata(gitlab_repo).items():
+        current = github_repo.get(field)
+
+        # GitHub returns null for an empty description or homepage
+        if isinstance(value, str) and current is None:
+            current = ''
+
+        if current != value:
+            return True
+
+    return False
+
+
+async def create_repo(gitlab_repo):
     """Creates GitHub repository based on a metadata from given GitLab repository.
 
     Args:
@@ -63,35 +161,27 @@ def create_repo(gitlab_repo, github_org):
     """
 
     github_name = gitlab_repo["github_name"]
-    github_path = f'orgs/{github_org}' if github_org else f'user' 
     github_archive = gitlab_repo["archived"]
-    github_type = False if gitlab_repo["visibility"] == "public" else True
-
-    url = f'https://api.github.com/{github_path}/repos'
-    headers = { 'Authorization': f'Bearer {token}' }
 
     data = {
         'name': github_name,
-        'description': f'{gitlab_repo["description"]}',
-        'homepage': gitlab_repo['web_url'],
-        'private': github_type,
         'archived': github_archive,
-        'has_wiki': False,
-        'has_projects': False
+        **repo_metadata(gitlab_repo)
     }
 
     try:
-        r = requests.post(url, json=data, headers=headers)
+        r = await _client().post(cfg.repos_url, json=data)
         r.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        if not "errors" in e.response.json() or e.response.json()["errors"][0]["message"] != "name already exists on this account":
-            print("Failed to create github repository: "+github_name)
-            pprint(e.response.json(), stream=sys.stderr)
+    except httpx.HTTPError as e:
+        body = _error_body(e)
+        error = (body.get("errors") or [{}])[0]
+        if not isinstance(error, dict) or error.get("message") != "name already exists on this account":
+            logger.error("Failed to create github repository %s: %s", github_name, body)
             raise SystemExit(e)
 
-    return r.json()
+    return orjson.loads(r.content)
 
-def delete_repo(gitlab_repo, github_org):
+async def delete_repo(gitlab_repo):
     """Creates GitHub repository based on a metadata from given GitLab repository.
 
     Args:
@@ -102,57 +192,41 @@ def delete_repo(gitlab_repo, github_org):
     """
 
     github_name = gitlab_repo["github_name"]
-    github_path = f'{github_org}' if github_org else f'user' 
-    github_archive = gitlab_repo["archived"]
-    github_type = False if gitlab_repo["visibility"] == "public" else True
 
-    url = f'https://api.github.com/repos/{github_path}/{github_name}'
-    headers = {'Authorization': f'Bearer {token}'}
+    url = f'https://api.github.com/repos/{cfg.owner}/{github_name}'
 
     try:
-        r = requests.delete(url, headers=headers)
+        r = await _client().delete(url)
         r.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        if not "message" in e.response.json() or e.response.json()["message"] != "Not Found":
-            print("Failed to delete github repository: "+github_name)
-            pprint(e.response.json(), stream=sys.stderr)
+    except httpx.HTTPError as e:
+        body = _error_body(e)
+        if body.get("message") != "Not Found":
+            logger.error("Failed to delete github repository %s: %s", github_name, body)
             raise SystemExit(e)
 
-def patch_repo(gitlab_repo, github_org):
+async def patch_repo(gitlab_repo):
     """Patches GitHub repository based on a metadata from given GitLab repository.
 
     Args:
      - gitlab_repo: GitLab repository which metadata (ie. name, description etc.) is used to create the GitHub repo.
-     - github_org: GitHub organization name
 
     Returns:
      - JSON representation of created GitHub repo.
     """
 
-    github_archive = gitlab_repo["archived"]
-    github_type = False if gitlab_repo["visibility"] == "public" else True
-    
     github_name = gitlab_repo["github_name"]
-    github_path = f'{github_org}' if github_org else f'user' 
-    headers = {'Authorization': f'Bearer {token}'}
 
     data = {
         'name': github_name,
-        'description': f'{gitlab_repo["description"]}',
-        'homepage': gitlab_repo['web_url'],
-        'private': github_type,
-        'has_wiki': False,
-        'has_projects': False
+        **repo_metadata(gitlab_repo)
     }
-    
-    github_path = f'{github_org}' if github_org else f'user' 
-    url = f'https://api.github.com/repos/{github_path}/{github_name}'
+
+    url = f'https://api.github.com/repos/{cfg.owner}/{github_name}'
     try:
-        r = requests.patch(url, json=data, headers=headers)
+        r = await _client().patch(url, json=data)
         r.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print("Failed to patch github repository: "+github_name)
-        pprint(e.response.json(), stream=sys.stderr)
+    except httpx.HTTPError as e:
+        logger.error("Failed to patch github repository %s: %s", github_name, _error_body(e))
         raise SystemExit(e)
 
-    return r.json()
+    return orjson.loads(r.content)
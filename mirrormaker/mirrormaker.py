@@ -1,10 +1,15 @@
+import asyncio
 import click
-import requests
+import logging
 from tabulate import tabulate
 from . import __version__
+from . import cache
 from . import gitlab
 from . import github
 
+# Maximum number of repositories checked at once, and of repositories updated at once
+MAX_CONCURRENCY = 8
+
 @click.command(context_settings={'auto_envvar_prefix': 'MIRRORMAKER'})
 @click.version_option(version=__version__)
 
@@ -41,41 +46,67 @@ def mirrormaker(github_token, github_user, github_org, github_strip, github_no_n
     its namespace is assumed to be the current user, or the path of a project
     under a specific namespace ("mynamespace/myproject").
     """
+    logging.basicConfig(format='%(message)s')
+
     github.token = github_token
     github.org = github_org
     github.user = github_user
+    github.configure(github_org, github_user)
     github_strip = github_strip.split(" ") if github_strip else []
     github_duplicates = not github_no_duplicates
     github_namespaces = not github_no_namespaces
 
     gitlab.token = gitlab_token
-    gitlab.api = gitlab_api
+    gitlab.configure(gitlab_api)
     gitlab_visibility = "public" if not gitlab_private else ""
 
     gitlab_page = 0 if repo else gitlab_page
-    if repo:
-        gitlab_repos = gitlab.get_repos_by_shorthand(repo, gitlab_visibility, gitlab_archive, gitlab_page, True if gitlab_page == 0 else False, github_strip, github_duplicates, github_namespaces)
-    else:
-        click.echo('Getting your GitLab repositories.. ', nl=False)
-        gitlab_repos = gitlab.get_repos(gitlab_visibility, gitlab_archive, gitlab_page, True if gitlab_page == 0 else False, github_strip, github_duplicates, github_namespaces)
-        if not gitlab_repos:
-            click.echo('There are no repositories in your GitLab account.')
-            return
+    asyncio.run(mirror_repos(repo, github_strip, github_duplicates, github_namespaces, gitlab_visibility, gitlab_archive, gitlab_page, dry_run, pull_mirrors, delete_mirrors, delete_from_github, print_sync))
+
 
-    click.echo('Getting your GitHub repositories..')
+async def mirror_repos(repo, github_strip, github_duplicates, github_namespaces, gitlab_visibility, gitlab_archive, gitlab_page, dry_run, pull_mirrors, delete_mirrors, delete_from_github, print_sync):
+    """Fetches GitLab and GitHub repositories, prints the summary and performs the necessary actions."""
+
+    try:
+        if repo:
+            gitlab_repos = await gitlab.get_repos_by_shorthand(repo, gitlab_visibility, gitlab_archive, gitlab_page, True if gitlab_page == 0 else False, github_strip, github_duplicates, github_namespaces)
+        else:
+            click.echo('Getting your GitLab repositories.. ', nl=False)
+            gitlab_repos = await gitlab.get_repos(gitlab_visibility, gitlab_archive, gitlab_page, True if gitlab_page == 0 else False, github_strip, github_duplicates, github_namespaces)
+            if not gitlab_repos:
+                click.echo('There are no repositories in your GitLab account.')
+                return
+
+        click.echo('Getting your GitHub repositories..')
+
+        github_repos = await github.get_repos()
+        cache.save()
+
+        if dry_run:
+            actions = await find_actions_to_perform(gitlab_repos, github_repos, delete_mirrors, delete_from_github, pull_mirrors)
+            print_summary_table(actions, print_sync)
+            click.echo('Run without the --apply flag to create missing repositories and mirrors.')
+            return
 
-    github_repos = github.get_repos(github_org)
+        # Each action is performed as soon as the status of its repository is known
+        click.echo('Updating GitHub repositories.. ', nl=False)
+        actions = iter_actions(gitlab_repos, github_repos, delete_mirrors, delete_from_github, pull_mirrors)
 
-    actions = find_actions_to_perform(github_org, gitlab_repos, github_repos, delete_mirrors, delete_from_github, pull_mirrors)
-    print_summary_table(actions, print_sync)
+        # Summarize what was found even if an action failed
+        performed = []
+        try:
+            await perform_actions(actions, len(gitlab_repos), performed)
+        finally:
+            print_summary_table(performed, print_sync, "Print table summary of the repositories and mirrors found before the update:")
 
-    click.echo('Updating GitHub repositories.. ', nl=False)
-    perform_actions(github_org, actions, dry_run, gitlab_visibility)
+        click.echo('Done!')
 
-    click.echo('Done!')
+    finally:
+        await github.close()
+        await gitlab.close()
 
 
-def find_actions_to_perform(github_org, gitlab_repos, github_repos, delete_mirrors, delete_github, pull_mirrors):
+async def find_actions_to_perform(gitlab_repos, github_repos, delete_mirrors, delete_github, pull_mirrors):
     """Goes over provided repositories and figure out what needs to be done to create missing mirrors.
 
     Args:
@@ -88,21 +119,47 @@ def find_actions_to_perform(github_org, gitlab_repos, github_repos, delete_mirro
     """
 
     actions = []
-    with click.progressbar(gitlab_repos, label='Checking mirrors status', show_eta=False) as bar:
+    with click.progressbar(length=len(gitlab_repos), label='Checking mirrors status', show_eta=False) as bar:
 
-        for gitlab_repo in bar:
-            action = check_mirror_status(gitlab_repo, github_repos, delete_mirrors, delete_github, pull_mirrors)
+        async for action in iter_actions(gitlab_repos, github_repos, delete_mirrors, delete_github, pull_mirrors):
             actions.append(action)
+            bar.update(1)
 
     return actions
 
 
-def check_mirror_status(gitlab_repo, github_repos, delete_mirrors, delete_github, pull_mirrors):
+async def iter_actions(gitlab_repos, github_repos, delete_mirrors, delete_github, pull_mirrors):
+    """Checks the mirror status of the provided repositories concurrently.
+
+    Args:
+     - gitlab_repos: List of GitLab repositories.
+     - github_repos: List of GitHub repositories.
+
+    Yields:
+     - action: Action necessary to perform on a GitLab repo (see find_actions_to_perform()), in completion order.
+    """
+
+    # GitHub names are case-insensitive (eg: --github-user Grdl owns grdl/one)
+    github_repos_by_name = {repo['full_name'].casefold(): repo for repo in github_repos}
+    github_git_urls = frozenset(f'{name}.git' for name in github_repos_by_name)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def check(gitlab_repo):
+        async with semaphore:
+            return await check_mirror_status(gitlab_repo, github_repos_by_name, github_git_urls, delete_mirrors, delete_github, pull_mirrors)
+
+    for action in asyncio.as_completed([check(gitlab_repo) for gitlab_repo in gitlab_repos]):
+        yield await action
+
+
+async def check_mirror_status(gitlab_repo, github_repos_by_name, github_git_urls, delete_mirrors, delete_github, pull_mirrors):
     """Checks if given GitLab repository has a mirror created among the given GitHub repositories. 
 
     Args:
      - gitlab_repo: GitLab repository.
-     - github_repos: List of GitHub repositories.
+     - github_repos_by_name: GitHub repositories by casefolded full name.
+     - github_git_urls: Set of casefolded GitHub repositories paths, as found in mirror URLs.
      - delete_mirrors: Delete existing mirror links on GitLab
      - delete_github: Delete target repository on GitHub
 
@@ -116,22 +173,24 @@ def check_mirror_status(gitlab_repo, github_repos, delete_mirrors, delete_github
         'create_mirror': True, 'delete_mirrors': delete_mirrors, 'pull_mirrors': pull_mirrors
     }
 
-    mirrors = gitlab.get_mirrors(gitlab_repo)
+    # No mirror can point to an existing GitHub repository if there is none (eg: first run)
+    mirrors = await gitlab.get_mirrors(gitlab_repo) if github_git_urls else []
 
-    if gitlab.mirror_target_exists(github_repos, mirrors):
+    if gitlab.mirror_target_exists(github_git_urls, mirrors):
         action['create_mirror'] = False
 
-    if github.repo_exists(github_repos, gitlab_repo["github_name"]):
+    github_slug = f'{github.cfg.owner}/{gitlab_repo["github_name"]}'.casefold()
+    if github.repo_exists(github_repos_by_name, github_slug):
         action['create_github'] = False
-        action['patch_github'] = True
+        action['patch_github'] = github.repo_outdated(github_repos_by_name[github_slug], gitlab_repo)
 
     return action
 
-def print_summary_table(actions, print_sync = False):
+def print_summary_table(actions, print_sync = False, title = "Print table summary before modification:"):
     """Prints a table summarizing whether mirrors are already created or missing
     """
 
-    click.echo("\nPrint table summary before modification:")
+    click.echo("\n" + title)
 
     created = click.style(u'\u2714 found', fg='green')
     missing = click.style(u'\u2718 not found', fg='red')
@@ -139,50 +198,97 @@ def print_summary_table(actions, print_sync = False):
     headers = ['GitLab repo', 'Visibility', 'Archived', 'GitHub repo', 'Mirror']
     if(print_sync): headers.append("Sync link")
 
-    summary = []
-    for action in actions:
-        row = [action["gitlab_repo"]["path_with_namespace"]]
-        row.append(action["gitlab_repo"]["visibility"])
-        row.append(action["gitlab_repo"]["archived"])
-        row.append(action["gitlab_repo"]["github_name"]+" "+missing) if action["create_github"] else row.append(action["gitlab_repo"]["github_name"]+" "+created)
-        row.append(missing) if action["create_mirror"] else row.append(created)
-        if(print_sync): 
-            row.append(gitlab.sync_remote(action["gitlab_repo"]))
-        summary.append(row)
+    def summary():
+        for action in sorted(actions, key=lambda action: action["gitlab_repo"]["path_with_namespace"]):
+            gitlab_repo = action["gitlab_repo"]
+            row = [
+                gitlab_repo["path_with_namespace"],
+                gitlab_repo["visibility"],
+                gitlab_repo["archived"],
+                gitlab_repo["github_name"] + " " + (missing if action["create_github"] else created),
+                missing if action["create_mirror"] else created
+            ]
+            if(print_sync):
+                row.append(gitlab.sync_remote(gitlab_repo))
+            yield row
+
+    click.echo(tabulate(summary(), headers) + '\n')
+
+async def perform_actions(actions, total, performed = None):
+    """Creates GitHub repositories and configures GitLab mirrors where necessary. 
+
+    Actions are queued as soon as they are produced and performed by a fixed pool of
+    MAX_CONCURRENCY workers. Since iter_actions() keeps checking up to MAX_CONCURRENCY
+    repositories meanwhile, up to 2 x MAX_CONCURRENCY API calls are in flight at once,
+    plus the mirrors of a repository which are all deleted at once with --delete-mirrors.
 
-    summary.sort()
+    Args:
+     - actions: Async iterable of actions to perform, either creating GitHub repo and/or configuring GitLab mirror (see iter_actions()).
+     - total: Number of actions expected, for the progress bar.
+     - performed: List to collect the actions into as they are queued, still filled if an action fails.
 
-    click.echo(tabulate(summary, headers) + '\n')
+    Returns:
+     - List of the performed actions.
+    """
 
-def perform_actions(github_org, actions, dry_run, gitlab_visibility):
-    """Creates GitHub repositories and configures GitLab mirrors where necessary. 
+    queue = asyncio.Queue()
+
+    performed = [] if performed is None else performed
+    with click.progressbar(length=total, label='Processing mirrors', show_eta=False) as bar:
+
+        async def worker():
+            while True:
+                action = await queue.get()
+                try:
+                    await perform_action(action)
+                finally:
+                    queue.task_done()
+                    bar.update(1)
+
+        workers = [asyncio.create_task(worker()) for _ in range(MAX_CONCURRENCY)]
+        try:
+            async for action in actions:
+                # Stop on the first failed action rather than after the last status check
+                for task in workers:
+                    if task.done():
+                        task.result()
+
+                performed.append(action)
+                queue.put_nowait(action)
+
+            # A worker only stops on failure, which would leave the queue unfinished
+            done, _ = await asyncio.wait([asyncio.ensure_future(queue.join()), *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+
+        finally:
+            for task in workers:
+                task.cancel()
+
+    return performed
+
+
+async def perform_action(action):
+    """Performs a single action, GitHub changes first and then the GitLab mirror configuration.
 
     Args:
-     - actions: List of actions to perform, either creating GitHub repo and/or configuring GitLab mirror.
-     - dry_run (bool): When True the actions are not performed.
+     - action: Action to perform (see find_actions_to_perform()).
     """
 
-    if dry_run:
-        click.echo('Run without the --apply flag to create missing repositories and mirrors.')
-        return
-
-    with click.progressbar(actions, label='Processing mirrors', show_eta=False) as bar:
-        for action in bar:
-
-            if action["delete_github"]:
-                github.delete_repo(action["gitlab_repo"], github_org)
-            elif action["create_github"]:
-                github.create_repo(action["gitlab_repo"], github_org)
-            elif action["patch_github"]:
-                github.patch_repo(action["gitlab_repo"], github_org)
-
-            if action["delete_mirrors"]:
-                gitlab.delete_mirrors(action["gitlab_repo"])
-            else:
-                if action["create_mirror"]:
-                    gitlab.create_mirror(action["gitlab_repo"], github.token, github.org, github.user)
-                if action["pull_mirrors"]:
-                    gitlab.pull_mirror(action["gitlab_repo"], github.token, github.org, github.user)
+    if action["delete_github"]:
+        await github.delete_repo(action["gitlab_repo"])
+    elif action["create_github"]:
+        await github.create_repo(action["gitlab_repo"])
+    elif action["patch_github"]:
+        await github.patch_repo(action["gitlab_repo"])
+
+    if action["delete_mirrors"]:
+        await gitlab.delete_mirrors(action["gitlab_repo"])
+    else:
+        if action["create_mirror"]:
+            await gitlab.create_mirror(action["gitlab_repo"], github.token, github.org, github.user)
+        if action["pull_mirrors"]:
+            await gitlab.pull_mirror(action["gitlab_repo"], github.token, github.org, github.user)
 
 if __name__ == '__main__':
     # pylint: disable=no-value-for-parameter, unexpected-keyword-arg
@@ -0,0 +1,83 @@
+import asyncio
+import httpx
+import logging
+import time
+
+# Statuses of rate limited requests and of transient gateway failures
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+# Methods which can be sent again even if the server may have processed the failed attempt
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+logger = logging.getLogger(__name__)
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """Transport retrying rate limited and transient failures with an exponential backoff.
+
+    Rate limited requests (429, or 403 with the GitHub secondary rate limit headers) are always
+    retried since they were not processed. Gateway failures and network errors are only retried
+    for idempotent methods, except connection failures which never reached the server.
+
+    Args:
+     - transport: Transport actually sending the requests.
+     - retries: Maximum number of retries of a request.
+     - backoff_factor: Delay before the first retry in seconds, doubled on each following retry.
+     - min_remaining: Number of requests left in the rate limit window under which to wait for its reset.
+    """
+
+    def __init__(self, transport, retries = 5, backoff_factor = 1, min_remaining = 5):
+        self.transport = transport
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.min_remaining = min_remaining
+
+    async def handle_async_request(self, request):
+        idempotent = request.method in IDEMPOTENT_METHODS
+
+        for attempt in range(self.retries + 1):
+            delay = self.backoff_factor * 2 ** attempt
+            last_attempt = attempt == self.retries
+
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                if last_attempt or not (idempotent or isinstance(e, httpx.ConnectError)):
+                    raise
+            else:
+                rate_limited = response.status_code == 429 or (response.status_code == 403 and (
+                    'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'))
+
+                if last_attempt or not (rate_limited or (idempotent and response.status_code in RETRY_STATUSES)):
+                    await self._wait_for_rate_limit(response)
+                    return response
+
+                delay = self._retry_after(response, delay)
+                await response.aclose()
+
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+    def _retry_after(self, response, default):
+        """Reads how long to wait before retrying from the Retry-After or X-RateLimit-Reset headers."""
+
+        if response.headers.get('Retry-After', '').isdigit():
+            return int(response.headers['Retry-After'])
+
+        if response.headers.get('X-RateLimit-Remaining') == '0' and response.headers.get('X-RateLimit-Reset', '').isdigit():
+            return max(0, int(response.headers['X-RateLimit-Reset']) - time.time())
+
+        return default
+
+    async def _wait_for_rate_limit(self, response):
+        """Waits for the rate limit window to reset when (almost) no requests are left in it."""
+
+        remaining = response.headers.get('X-RateLimit-Remaining', '')
+        reset = response.headers.get('X-RateLimit-Reset', '')
+
+        if remaining.isdigit() and int(remaining) < self.min_remaining and reset.isdigit():
+            delay = max(0, int(reset) - time.time())
+            logger.warning("Rate limit almost reached, waiting %ds for it to reset..", delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,63 @@
+import asyncio
+import httpx
+import orjson
+from . import cache
+from . import retry
+
+# Maximum number of listing pages requested at once
+MAX_PAGE_REQUESTS = 5
+
+
+class Session:
+    """HTTP client shared by all the calls to one API, created on first use (once the token is set)."""
+
+    def __init__(self):
+        self._client = None
+
+    def client(self, token):
+        """Returns the shared HTTP client, creating it on first use.
+
+        Args:
+         - token: Token authenticating the requests to the API.
+
+        Returns:
+         - HTTP client retrying rate limited and transient failures.
+        """
+
+        if self._client is None:
+            limits = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+            transport = retry.RetryTransport(httpx.AsyncHTTPTransport(http2=True, limits=limits))
+            self._client = httpx.AsyncClient(headers={'Authorization': f'Bearer {token}'}, transport=transport, timeout=30)
+
+        return self._client
+
+    async def close(self):
+        """Closes the shared HTTP client."""
+
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def get_pages(client, url, pages, params = {}):
+    """Fetches the given pages of a paginated listing concurrently, with conditional requests.
+
+    Args:
+     - client: HTTP client to send the requests with.
+     - url: URL of the listing.
+     - pages: Page numbers to fetch.
+     - params: Query parameters of the listing, besides the page number.
+
+    Returns:
+     - List of JSON bodies, in the same order as pages.
+    """
+
+    semaphore = asyncio.Semaphore(MAX_PAGE_REQUESTS)
+
+    async def get_page(page):
+        async with semaphore:
+            r = await cache.cached_get(client, url, {**params, 'page': page})
+        r.raise_for_status()
+        return orjson.loads(r.content)
+
+    return await asyncio.gather(*[get_page(page) for page in pages])